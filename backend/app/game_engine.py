@@ -1,24 +1,89 @@
 from __future__ import annotations
-import uuid
-from typing import Optional
+import bisect
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import NamedTuple, Optional, Sequence
 from .models import (
-    Room, HandState, HandPhase, Player, PlayerAction,
+    MAX_SEATS, Room, HandState, HandPhase, Player, PlayerAction,
     PlayerStatus, PotInfo, RoomStatus, SettlementProposal,
 )
 
+# Statuses of players still in the hand / still able to act
+_ACTIVE_STATUSES = frozenset({PlayerStatus.ACTIVE, PlayerStatus.ALL_IN})
+_ACTIONABLE_STATUSES = frozenset({PlayerStatus.ACTIVE})
 
-def get_seated_players(room: Room) -> list[Player]:
-    """Return players sorted by seat index who are seated (including disconnected)."""
+# Betting street -> the street that follows it
+_NEXT_PHASE: dict[HandPhase, HandPhase] = {
+    HandPhase.PREFLOP: HandPhase.FLOP,
+    HandPhase.FLOP: HandPhase.TURN,
+    HandPhase.TURN: HandPhase.RIVER,
+    HandPhase.RIVER: HandPhase.SHOWDOWN,
+}
+
+
+def get_seated_players(room: Room) -> tuple[Player, ...]:
+    """Return players sorted by seat index who are seated (including disconnected).
+
+    The result is cached on the room until ``room._invalidate_seated()`` is called;
+    it is a tuple so callers cannot mutate the shared cache.
+    """
+    seated = room._seated_player_cache
+    if seated is not None:
+        return seated
     seated = []
-    for seat_idx in sorted(room.seats.keys()):
-        pid = room.seats[seat_idx]
-        if pid and pid in room.players:
-            p = room.players[pid]
-            if p.seat >= 0:
-                seated.append(p)
+    seat_to_player: list[Optional[Player]] = [None] * MAX_SEATS
+    for pid in room.seats:
+        if not pid:
+            continue
+        p = room.players.get(pid)
+        if p is not None and p.seat >= 0:
+            seated.append(p)
+            seat_to_player[p.seat] = p
+    seated = tuple(seated)
+    room._seated_player_cache = seated
+    room._sorted_seat_indices = tuple(p.seat for p in seated)
+    room._seat_to_player = seat_to_player
+    room._next_seat = _build_next_seat_table(room._sorted_seat_indices)
     return seated
 
 
+def _build_next_seat_table(seat_indices: Sequence[int]) -> list[int]:
+    """Entry s is the first of `seat_indices` (sorted) clockwise after seat s, wrapping.
+
+    Every seat 0..MAX_SEATS-1 gets an entry, occupied or not; all -1 if empty.
+    """
+    next_seat = [-1] * MAX_SEATS
+    if seat_indices:
+        occupied = set(seat_indices)
+        nxt = seat_indices[0]
+        for s in range(MAX_SEATS - 1, -1, -1):
+            next_seat[s] = nxt
+            if s in occupied:
+                nxt = s
+    return next_seat
+
+
+def get_seat_indices(room: Room) -> tuple[int, ...]:
+    """Return the sorted seat indices of seated players (cached with get_seated_players)."""
+    if room._sorted_seat_indices is None:
+        get_seated_players(room)
+    return room._sorted_seat_indices
+
+
+def get_seat_to_player(room: Room) -> list[Optional[Player]]:
+    """Return a MAX_SEATS-long list mapping seat index -> seated Player (or None)."""
+    if room._seat_to_player is None:
+        get_seated_players(room)
+    return room._seat_to_player
+
+
+def get_next_seat_table(room: Room) -> list[int]:
+    """Return a MAX_SEATS-long ring: entry s is the next occupied seat after seat s (-1 if empty table)."""
+    if room._next_seat is None:
+        get_seated_players(room)
+    return room._next_seat
+
+
 def get_connected_seated_players(room: Room) -> list[Player]:
     """Return seated players who are currently connected."""
     return [p for p in get_seated_players(room) if p.is_connected]
@@ -26,39 +91,27 @@ def get_connected_seated_players(room: Room) -> list[Player]:
 
 def get_active_players(room: Room) -> list[Player]:
     """Players who haven't folded and are seated."""
-    return [p for p in get_seated_players(room) if p.status != PlayerStatus.FOLDED and p.status != PlayerStatus.SITTING_OUT]
+    return [p for p in get_seated_players(room) if p.status in _ACTIVE_STATUSES]
 
 
 def get_actionable_players(room: Room) -> list[Player]:
     """Players who can still act (not folded, not all-in)."""
-    return [p for p in get_active_players(room) if p.status != PlayerStatus.ALL_IN]
+    return [p for p in get_seated_players(room) if p.status in _ACTIONABLE_STATUSES]
 
 
 def find_next_dealer(room: Room) -> int:
     """Find next dealer seat, moving clockwise from current dealer."""
-    seated = get_seated_players(room)
-    if not seated:
+    seat_indices = get_seat_indices(room)
+    if not seat_indices:
         return -1
     
     current_dealer = room.hand.dealer_seat if room.hand else -1
-    seat_indices = [p.seat for p in seated]
     
     if current_dealer == -1:
         return seat_indices[0]
     
-    # Find next occupied seat after current dealer
-    for s in seat_indices:
-        if s > current_dealer:
-            return s
-    return seat_indices[0]
-
-
-def find_next_seat(seat_indices: list[int], after_seat: int) -> int:
-    """Find next seat in clockwise order after given seat."""
-    for s in seat_indices:
-        if s > after_seat:
-            return s
-    return seat_indices[0]
+    # Next occupied seat after current dealer
+    return get_next_seat_table(room)[current_dealer]
 
 
 def start_hand(room: Room) -> Room:
@@ -83,17 +136,25 @@ def start_hand(room: Room) -> Room:
     # Determine dealer position
     dealer_seat = find_next_dealer(room)
     
+    # Blinds rotate over connected players only; when everyone seated is
+    # connected (the usual case) the cached seat ring already describes them
+    if len(seated) == len(get_seated_players(room)):
+        next_seat = get_next_seat_table(room)
+    else:
+        next_seat = _build_next_seat_table(seat_indices)
+    
     if len(seated) == 2:
         # Heads-up: dealer is SB
         sb_seat = dealer_seat
-        bb_seat = find_next_seat(seat_indices, sb_seat)
+        bb_seat = next_seat[sb_seat]
     else:
-        sb_seat = find_next_seat(seat_indices, dealer_seat)
-        bb_seat = find_next_seat(seat_indices, sb_seat)
+        sb_seat = next_seat[dealer_seat]
+        bb_seat = next_seat[sb_seat]
     
     # Post blinds
-    sb_player = room.players[room.seats[sb_seat]]
-    bb_player = room.players[room.seats[bb_seat]]
+    seat_to_player = get_seat_to_player(room)
+    sb_player = seat_to_player[sb_seat]
+    bb_player = seat_to_player[bb_seat]
     
     sb_actual = min(sb_player.chips, room.sb_amount)
     bb_actual = min(bb_player.chips, room.bb_amount)
@@ -130,207 +191,235 @@ def start_hand(room: Room) -> Room:
     hand.action_index = 0
     
     if action_order:
-        hand.current_player_id = action_order[0]
+        hand.current_player_id = seat_to_player[action_order[0]].id
     
     return room
 
 
-def build_action_order(room: Room, after_seat: int) -> list[str]:
-    """Build action order starting from player after given seat."""
-    seated = get_seated_players(room)
-    seat_indices = [p.seat for p in seated]
-    
-    # Reorder starting from after_seat
-    start_idx = 0
-    for i, s in enumerate(seat_indices):
-        if s > after_seat:
-            start_idx = i
-            break
-    else:
-        start_idx = 0
+def build_action_order(room: Room, after_seat: int) -> list[int]:
+    """Build action order (seat indices of active players) starting after given seat."""
+    seat_indices = get_seat_indices(room)
     
+    # Reorder starting from after_seat (a start past the end wraps to the full list)
+    start_idx = bisect.bisect_right(seat_indices, after_seat)
     ordered = seat_indices[start_idx:] + seat_indices[:start_idx]
     
-    result = []
-    for s in ordered:
-        pid = room.seats[s]
-        if pid and pid in room.players:
-            p = room.players[pid]
-            if p.status == PlayerStatus.ACTIVE:
-                result.append(pid)
-    
-    return result
+    seat_to_player = get_seat_to_player(room)
+    return [s for s in ordered if seat_to_player[s].status in _ACTIONABLE_STATUSES]
+
+
+@dataclass(slots=True)
+class ActionEvent:
+    """Result of process_action; `error` is set when the action was rejected."""
+    action: str
+    player_id: str
+    player_name: str = ""
+    detail: str = ""
+    amount: Optional[int] = None
+    phase_change: Optional[dict] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        if self.error is not None:
+            return {"error": self.error}
+        data = {
+            "action": self.action,
+            "player_id": self.player_id,
+            "player_name": self.player_name,
+            "detail": self.detail,
+        }
+        if self.amount is not None:
+            data["amount"] = self.amount
+        if self.phase_change is not None:
+            data["phase_change"] = self.phase_change
+        return data
 
 
-def process_action(room: Room, player_id: str, action: PlayerAction, amount: int = 0) -> tuple[Room, dict]:
-    """Process a player action. Returns updated room and event dict."""
+def _reopen_action(actionable: list[Player], raiser: Player):
+    """Reset has_acted for everyone who must respond to a raise.
+
+    `actionable` already holds only ACTIVE players, so no status check or
+    id lookup is needed per player.
+    """
+    for p in actionable:
+        if p is not raiser:
+            p.has_acted = False
+
+
+def process_action(room: Room, player_id: str, action: PlayerAction, amount: int = 0) -> tuple[Room, ActionEvent]:
+    """Process a player action. Returns updated room and the action event."""
     hand = room.hand
     if not hand or hand.current_player_id != player_id:
-        return room, {"error": "Not your turn"}
+        return room, ActionEvent(action.value, player_id, error="Not your turn")
     
     player = room.players[player_id]
-    event = {"action": action.value, "player_id": player_id, "player_name": player.name}
+    event = ActionEvent(action.value, player_id, player.name)
+    
+    # Players who can act; only `player`'s status changes below
+    actionable = get_actionable_players(room)
+    
+    # Bind hot fields to locals; each branch writes back what it changes
+    hand_bet = hand.current_bet
+    player_bet = player.current_bet
+    chips = player.chips
     
     if action == PlayerAction.FOLD:
         player.status = PlayerStatus.FOLDED
         player.has_acted = True
         player.last_action = "fold"
-        event["detail"] = "folded"
+        event.detail = "folded"
         
     elif action == PlayerAction.CHECK:
-        if hand.current_bet > player.current_bet:
-            return room, {"error": "Cannot check, must call or raise"}
+        if hand_bet > player_bet:
+            event.error = "Cannot check, must call or raise"
+            return room, event
         player.has_acted = True
         player.last_action = "check"
-        event["detail"] = "checked"
+        event.detail = "checked"
         
     elif action == PlayerAction.CALL:
-        call_amount = hand.current_bet - player.current_bet
-        actual_call = min(call_amount, player.chips)
-        player.chips -= actual_call
-        player.current_bet += actual_call
+        actual_call = min(hand_bet - player_bet, chips)
+        chips -= actual_call
+        player.chips = chips
+        player.current_bet = player_bet + actual_call
         player.total_bet_this_hand += actual_call
         hand.pot += actual_call
-        if player.chips == 0:
+        if chips == 0:
             player.status = PlayerStatus.ALL_IN
         player.has_acted = True
         player.last_action = f"call:{actual_call}"
-        event["detail"] = f"called {actual_call}"
-        event["amount"] = actual_call
+        event.detail = f"called {actual_call}"
+        event.amount = actual_call
         
     elif action == PlayerAction.RAISE:
-        if amount <= hand.current_bet:
-            return room, {"error": f"Raise must be more than current bet {hand.current_bet}"}
-        raise_to = amount
-        cost = raise_to - player.current_bet
-        actual_cost = min(cost, player.chips)
-        player.chips -= actual_cost
-        actual_raise_to = player.current_bet + actual_cost
+        if amount <= hand_bet:
+            event.error = f"Raise must be more than current bet {hand_bet}"
+            return room, event
+        actual_cost = min(amount - player_bet, chips)
+        chips -= actual_cost
+        actual_raise_to = player_bet + actual_cost
+        player.chips = chips
         player.current_bet = actual_raise_to
         player.total_bet_this_hand += actual_cost
         hand.pot += actual_cost
         hand.current_bet = actual_raise_to
         hand.last_raiser_id = player_id
-        if player.chips == 0:
+        if chips == 0:
             player.status = PlayerStatus.ALL_IN
-        player.has_acted = True
         player.last_action = f"raise:{actual_raise_to}"
-        # Reset has_acted for others who need to respond to raise
-        for pid in hand.action_order:
-            if pid != player_id:
-                p = room.players[pid]
-                if p.status == PlayerStatus.ACTIVE:
-                    p.has_acted = False
+        _reopen_action(actionable, player)
         player.has_acted = True
-        event["detail"] = f"raised to {actual_raise_to}"
-        event["amount"] = actual_raise_to
+        event.detail = f"raised to {actual_raise_to}"
+        event.amount = actual_raise_to
         
     elif action == PlayerAction.ALL_IN:
-        all_in_amount = player.chips
-        player.current_bet += all_in_amount
-        player.total_bet_this_hand += all_in_amount
-        hand.pot += all_in_amount
+        all_in_to = player_bet + chips
+        player.current_bet = all_in_to
+        player.total_bet_this_hand += chips
+        hand.pot += chips
         player.chips = 0
         player.status = PlayerStatus.ALL_IN
-        player.last_action = f"all_in:{player.current_bet}"
-        if player.current_bet > hand.current_bet:
-            hand.current_bet = player.current_bet
+        player.last_action = f"all_in:{all_in_to}"
+        if all_in_to > hand_bet:
+            hand.current_bet = all_in_to
             hand.last_raiser_id = player_id
-            for pid in hand.action_order:
-                if pid != player_id:
-                    p = room.players[pid]
-                    if p.status == PlayerStatus.ACTIVE:
-                        p.has_acted = False
+            _reopen_action(actionable, player)
         player.has_acted = True
-        event["detail"] = f"all-in {player.current_bet}"
-        event["amount"] = player.current_bet
+        event.detail = f"all-in {all_in_to}"
+        event.amount = all_in_to
+    
+    if player.status not in _ACTIONABLE_STATUSES:
+        actionable = [p for p in actionable if p is not player]
     
     # Check if hand should end or street should advance
-    room, phase_event = check_street_end(room)
+    room, phase_event = check_street_end(room, actionable)
     if phase_event:
-        event["phase_change"] = phase_event
+        event.phase_change = phase_event
     
     return room, event
 
 
-def check_street_end(room: Room) -> tuple[Room, Optional[dict]]:
-    """Check if current street is over and advance accordingly."""
+class _StreetScan(NamedTuple):
+    active: int  # players still in the hand
+    actionable: int  # players who can still bet
+    all_acted: bool  # every actionable player has acted and matched the bet
+
+
+def _scan_street(room: Room, hand: HandState) -> _StreetScan:
+    """Walk seated players once and summarize the betting round."""
+    active = actionable = 0
+    all_acted = True
+    current_bet = hand.current_bet
+    for p in get_seated_players(room):
+        if p.status not in _ACTIVE_STATUSES:
+            continue
+        active += 1
+        if p.status in _ACTIONABLE_STATUSES:
+            actionable += 1
+            if not p.has_acted or p.current_bet < current_bet:
+                all_acted = False
+    return _StreetScan(active, actionable, all_acted)
+
+
+def check_street_end(room: Room, actionable: Optional[list[Player]] = None) -> tuple[Room, Optional[dict]]:
+    """Check if current street is over and advance accordingly.
+
+    `actionable` is handed on to advance_to_next_player when the caller has it.
+    """
     hand = room.hand
     if not hand:
         return room, None
     
-    active = get_active_players(room)
+    scan = _scan_street(room, hand)
     
     # Only 1 player remaining -> hand ends
-    if len(active) <= 1:
+    if scan.active <= 1:
         return end_hand_single_winner(room)
     
-    actionable = get_actionable_players(room)
-    
-    # Check if all actionable players have acted and matched the bet
-    all_acted = True
-    for p in actionable:
-        if not p.has_acted:
-            all_acted = False
-            break
-        if p.current_bet < hand.current_bet and p.status == PlayerStatus.ACTIVE:
-            all_acted = False
-            break
-    
-    if not all_acted:
+    if not scan.all_acted:
         # Move to next player
-        advance_to_next_player(room)
+        advance_to_next_player(room, actionable)
         return room, None
     
     # If 0 or 1 actionable players left, no more meaningful betting possible -> showdown
-    if len(actionable) <= 1:
+    if scan.actionable <= 1:
         return advance_to_showdown(room)
     
     # Street is complete, advance
     return advance_street(room)
 
 
-def advance_to_next_player(room: Room):
+def advance_to_next_player(room: Room, actionable: Optional[list[Player]] = None):
     """Move current_player_id to next actionable player."""
     hand = room.hand
     if not hand:
         return
     
-    actionable = get_actionable_players(room)
+    if actionable is None:
+        actionable = get_actionable_players(room)
     if not actionable:
         return
     
-    seated = get_seated_players(room)
-    seat_to_pid = {p.seat: p.id for p in seated}
-    seat_indices = sorted(seat_to_pid.keys())
-    actionable_ids = {p.id for p in actionable}
+    next_seat = get_next_seat_table(room)
+    seat_to_player = get_seat_to_player(room)
     
     # Find current player's seat
     current_pid = hand.current_player_id
-    if current_pid not in room.players:
+    current = room.players.get(current_pid)
+    if current is None:
         hand.current_player_id = actionable[0].id
         return
     
-    current_seat = room.players[current_pid].seat
-    
-    # Find next actionable player by seat order
-    ordered_seats = []
-    found = False
-    for s in seat_indices:
-        if s > current_seat:
-            found = True
-        if found:
-            ordered_seats.append(s)
-    for s in seat_indices:
-        if s <= current_seat:
-            ordered_seats.append(s)
-    
-    for s in ordered_seats:
-        pid = seat_to_pid.get(s)
-        if pid and pid in actionable_ids and pid != current_pid:
-            p = room.players[pid]
+    # Follow the seat ring clockwise from the current player, visiting each
+    # seated player once
+    s = current.seat
+    for _ in range(len(get_seated_players(room))):
+        s = next_seat[s]
+        p = seat_to_player[s]
+        # Seated + ACTIVE is exactly membership in `actionable`, so test status directly
+        if p.status in _ACTIONABLE_STATUSES and p is not current:
             if not p.has_acted or p.current_bet < hand.current_bet:
-                hand.current_player_id = pid
+                hand.current_player_id = p.id
                 return
     
     # Fallback
@@ -340,15 +429,9 @@ def advance_to_next_player(room: Room):
 def advance_street(room: Room) -> tuple[Room, Optional[dict]]:
     """Auto-advance to the next street."""
     hand = room.hand
-    phase_order = [HandPhase.PREFLOP, HandPhase.FLOP, HandPhase.TURN, HandPhase.RIVER, HandPhase.SHOWDOWN]
-    current_idx = phase_order.index(hand.phase)
+    next_phase = _NEXT_PHASE.get(hand.phase, HandPhase.SHOWDOWN)
     
-    if current_idx >= len(phase_order) - 1:
-        return advance_to_showdown(room)
-    
-    next_phase = phase_order[current_idx + 1]
-    
-    if next_phase == HandPhase.SHOWDOWN:
+    if next_phase is HandPhase.SHOWDOWN:
         return advance_to_showdown(room)
     
     hand.phase = next_phase
@@ -356,9 +439,9 @@ def advance_street(room: Room) -> tuple[Room, Optional[dict]]:
     hand.last_raiser_id = None
     
     # Reset player bets and last_action for new street
-    for p in room.players.values():
+    for p in get_seated_players(room):
         p.current_bet = 0
-        if p.status == PlayerStatus.ACTIVE:
+        if p.status in _ACTIONABLE_STATUSES:
             p.has_acted = False
             p.last_action = None
     
@@ -368,7 +451,7 @@ def advance_street(room: Room) -> tuple[Room, Optional[dict]]:
     hand.action_index = 0
     
     if action_order:
-        hand.current_player_id = action_order[0]
+        hand.current_player_id = get_seat_to_player(room)[action_order[0]].id
     else:
         return advance_to_showdown(room)
     
@@ -384,7 +467,7 @@ def advance_to_showdown(room: Room) -> tuple[Room, Optional[dict]]:
     # Calculate pots
     hand.pots = calculate_pots(room)
     
-    return room, {"phase": "showdown", "pots": [p.model_dump() for p in hand.pots]}
+    return room, {"phase": "showdown", "pots": [p.to_dict() for p in hand.pots]}
 
 
 def end_hand_single_winner(room: Room) -> tuple[Room, Optional[dict]]:
@@ -410,6 +493,21 @@ def end_hand_single_winner(room: Room) -> tuple[Room, Optional[dict]]:
     return room, {"phase": "showdown"}
 
 
+def _pot_id(room: Room, index: int) -> str:
+    """Pot ids only need to be unique within a hand: "<hand_number>-<index>"."""
+    return f"{room.hand_number}-{index}"
+
+
+def _mask_to_ids(players: list[Player], mask: int) -> list[str]:
+    """Ids of players[k] for each set bit k in mask, lowest bit (= earliest seat) first."""
+    ids = []
+    while mask:
+        lsb = mask & -mask
+        ids.append(players[lsb.bit_length() - 1].id)
+        mask ^= lsb
+    return ids
+
+
 def calculate_pots(room: Room) -> list[PotInfo]:
     """Calculate main pot and side pots based on all-in amounts.
     
@@ -424,39 +522,57 @@ def calculate_pots(room: Room) -> list[PotInfo]:
     contributors = [p for p in get_seated_players(room) if p.total_bet_this_hand > 0]
     
     if not contributors:
-        return [PotInfo(id=str(uuid.uuid4())[:8], amount=room.hand.pot, eligible_players=[p.id for p in active])]
-    
-    # Only all-in players create side pot boundaries
-    all_in_levels = sorted(set(
-        p.total_bet_this_hand for p in contributors
-        if p.status == PlayerStatus.ALL_IN
-    ))
+        return [PotInfo(id=_pot_id(room, 0), amount=room.hand.pot, eligible_players=[p.id for p in active])]
+    
+    # One pass over contributors gathers everything the sweep needs: bets,
+    # the all-in levels (only all-in players create side pot boundaries)
+    # and a bitmask of contributors still in the hand. Bit k refers to
+    # contributors[k], which is in seat order.
+    all_in = PlayerStatus.ALL_IN
+    folded = PlayerStatus.FOLDED
+    bets = []
+    all_in_bets = set()
+    in_hand_mask = 0
+    for k, p in enumerate(contributors):
+        bet = p.total_bet_this_hand
+        bets.append(bet)
+        if p.status == all_in:
+            all_in_bets.add(bet)
+        if p.status != folded:
+            in_hand_mask |= 1 << k
+    all_in_levels = sorted(all_in_bets)
     
     # If no all-in players, just one main pot
     if not all_in_levels:
         return [PotInfo(
-            id=str(uuid.uuid4())[:8],
+            id=_pot_id(room, 0),
             amount=room.hand.pot,
             eligible_players=[p.id for p in active],
         )]
     
+    # Sweep contributors in ascending bet order. A level's pot is the partial
+    # bets that end below it plus a full (level - prev_level) slice from
+    # everyone still at or above it, so each contributor is visited once.
+    by_bet = sorted(range(len(bets)), key=bets.__getitem__)
+    n = len(by_bet)
+    above_mask = (1 << n) - 1  # contributors still at or above the current level
+    i = 0
     pots = []
     prev_level = 0
     
     for level in all_in_levels:
         pot_amount = 0
-        eligible = []
-        for p in contributors:
-            contribution = min(p.total_bet_this_hand, level) - prev_level
-            if contribution > 0:
-                pot_amount += contribution
-            # Eligible if not folded and bet at least this level
-            if p.status != PlayerStatus.FOLDED and p.total_bet_this_hand >= level:
-                eligible.append(p.id)
+        while i < n and bets[by_bet[i]] < level:
+            pot_amount += bets[by_bet[i]] - prev_level
+            above_mask &= ~(1 << by_bet[i])
+            i += 1
+        pot_amount += (level - prev_level) * (n - i)
+        # Eligible if not folded and bet at least this level
+        eligible = _mask_to_ids(contributors, above_mask & in_hand_mask)
         
         if pot_amount > 0 and eligible:
             pots.append(PotInfo(
-                id=str(uuid.uuid4())[:8],
+                id=_pot_id(room, len(pots)),
                 amount=pot_amount,
                 eligible_players=eligible,
             ))
@@ -464,17 +580,16 @@ def calculate_pots(room: Room) -> list[PotInfo]:
     
     # Remaining pot above the highest all-in level
     remaining = 0
-    eligible = []
-    for p in contributors:
-        contribution = p.total_bet_this_hand - prev_level
-        if contribution > 0:
-            remaining += contribution
-        if p.status != PlayerStatus.FOLDED and p.total_bet_this_hand > prev_level:
-            eligible.append(p.id)
+    while i < n:
+        remaining += bets[by_bet[i]] - prev_level
+        if bets[by_bet[i]] == prev_level:
+            above_mask &= ~(1 << by_bet[i])
+        i += 1
+    eligible = _mask_to_ids(contributors, above_mask & in_hand_mask)
     
     if remaining > 0 and eligible:
         pots.append(PotInfo(
-            id=str(uuid.uuid4())[:8],
+            id=_pot_id(room, len(pots)),
             amount=remaining,
             eligible_players=eligible,
         ))
@@ -482,7 +597,7 @@ def calculate_pots(room: Room) -> list[PotInfo]:
     # Fallback
     if not pots:
         pots.append(PotInfo(
-            id=str(uuid.uuid4())[:8],
+            id=_pot_id(room, 0),
             amount=room.hand.pot,
             eligible_players=[p.id for p in active],
         ))
@@ -510,13 +625,13 @@ def confirm_settlement(room: Room, player_id: str) -> tuple[Room, dict]:
     if not hand or not hand.settlement_proposal:
         return room, {"error": "No settlement proposal"}
     
-    if player_id not in hand.settlement_proposal.confirmed_by:
-        hand.settlement_proposal.confirmed_by.append(player_id)
+    confirmed_by = hand.settlement_proposal.confirmed_by
+    if player_id not in confirmed_by:
+        confirmed_by.append(player_id)
     
-    # Check if all eligible players confirmed
-    active = get_active_players(room)
-    active_ids = {p.id for p in active}
-    all_confirmed = all(pid in hand.settlement_proposal.confirmed_by for pid in active_ids)
+    # Check if all eligible players confirmed (one hashed pass over confirmed_by)
+    active_ids = {p.id for p in get_active_players(room)}
+    all_confirmed = active_ids.issubset(confirmed_by)
     
     if all_confirmed:
         return execute_settlement(room)
@@ -543,8 +658,11 @@ def execute_settlement(room: Room) -> tuple[Room, dict]:
     settlements = []
     
     for pot in hand.pots:
-        winners = pot_winners.get(pot.id, [])
-        valid_winners = [w for w in winners if w in pot.eligible_players] if winners else []
+        winners = pot_winners.get(pot.id)
+        valid_winners = None
+        if winners:
+            eligible = set(pot.eligible_players)
+            valid_winners = [w for w in winners if w in eligible]
         
         # Fallback: if no valid winners specified, distribute to all eligible players
         if not valid_winners:
@@ -554,20 +672,19 @@ def execute_settlement(room: Room) -> tuple[Room, dict]:
             continue
         
         min_chip = room.sb_amount  # minimum chip denomination
-        n = len(valid_winners)
-        # Round each share down to a multiple of min_chip
-        share_raw = pot.amount // n
-        share = (share_raw // min_chip) * min_chip
-        # Remaining chips (in min_chip units) distributed one unit each to the first k winners
-        leftover_units = (pot.amount - share * n) // min_chip
+        winner_players = [room.players[wid] for wid in valid_winners]
+        # Split the pot in min_chip units: each winner gets share_units, and the
+        # leftover units go one each to the first winners
+        share_units, leftover_units = divmod(pot.amount // min_chip, len(winner_players))
+        share = share_units * min_chip
         
-        for i, wid in enumerate(valid_winners):
-            award = share + (min_chip if i < leftover_units else 0)
-            room.players[wid].chips += award
+        for i, winner in enumerate(winner_players):
+            award = share + min_chip * (i < leftover_units)
+            winner.chips += award
             settlements.append({
                 "pot_id": pot.id,
-                "player_id": wid,
-                "player_name": room.players[wid].name,
+                "player_id": winner.id,
+                "player_name": winner.name,
                 "amount": award,
             })
     
@@ -586,13 +703,12 @@ def reset_hand(room: Room):
     room.status = RoomStatus.WAITING
     
     # Reset player statuses
-    for p in room.players.values():
-        if p.seat >= 0:
-            p.status = PlayerStatus.ACTIVE
-            p.current_bet = 0
-            p.total_bet_this_hand = 0
-            p.has_acted = False
-            p.ready = False
+    for p in get_seated_players(room):
+        p.status = PlayerStatus.ACTIVE
+        p.current_bet = 0
+        p.total_bet_this_hand = 0
+        p.has_acted = False
+        p.ready = False
 
 
 def can_cashout(room: Room, player_id: str) -> bool:
@@ -662,7 +778,7 @@ def get_final_standings(room: Room) -> list[dict]:
             "total_investment": total_investment,
             "net": net,
         })
-    standings.sort(key=lambda x: x["net"], reverse=True)
+    standings.sort(key=itemgetter("net"), reverse=True)
     return standings
 
 
@@ -3,34 +3,43 @@ import asyncio
 import time
 import uuid
 import random
-import json
+import weakref
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from typing import Callable, Optional
+import orjson
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from .models import (
-    CreateRoomRequest, JoinRoomRequest, Room, Player,
+    CreateRoomRequest, JoinRoomRequest, Room, Player, MAX_SEATS,
     PlayerStatus, RoomStatus, HandPhase, ActionRequest,
     PlayerAction, SettlementVote, SeatRequest,
 )
-from .redis_manager import save_room, get_room, list_rooms, delete_room, close_redis, flush_all_rooms
+from .redis_manager import (
+    save_room, get_room, delete_room, close_redis, flush_all_rooms,
+    clear_player_room, get_player_room_id,
+    idle_room_ids, forget_room, lobby_rooms_json,
+)
 from .game_engine import (
     start_hand, process_action, get_seated_players,
     can_rebuy, do_rebuy, can_cashout, do_cashout, get_active_players,
     propose_settlement, confirm_settlement, reject_settlement,
     end_game,
 )
-from .ws_manager import manager
+from .ws_manager import manager, encode_message
 
 
-# Per-room locks to serialize state mutations and prevent race conditions
-_room_locks: dict[str, asyncio.Lock] = {}
+# Per-room locks to serialize state mutations and prevent race conditions.
+# Weak values: a lock lives only while some coroutine holds or waits on it,
+# so locks for finished or abandoned rooms don't accumulate.
+_room_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
 
 
 def get_room_lock(room_id: str) -> asyncio.Lock:
-    if room_id not in _room_locks:
-        _room_locks[room_id] = asyncio.Lock()
-    return _room_locks[room_id]
+    lock = _room_locks.get(room_id)
+    if lock is None:
+        lock = _room_locks[room_id] = asyncio.Lock()
+    return lock
 
 
 EMOJIS = [
@@ -56,21 +65,13 @@ async def room_cleanup_task():
     while True:
         await asyncio.sleep(10)
         try:
-            rooms = await list_rooms()
-            now = time.time()
-            for r in rooms:
-                online = any(p.is_connected for p in r.players.values())
-                if online:
-                    if r.last_all_disconnected_at is not None:
-                        r.last_all_disconnected_at = None
-                        await save_room(r)
-                else:
-                    if r.last_all_disconnected_at is None:
-                        r.last_all_disconnected_at = now
-                        await save_room(r)
-                    elif now - r.last_all_disconnected_at > 600:  # 10 minutes
-                        await delete_room(r.id)
-                        _room_locks.pop(r.id, None)
+            for room_id in await idle_room_ids(time.time() - 600):  # 10 minutes
+                async with get_room_lock(room_id):
+                    room = await get_room(room_id)
+                    # Someone may have reconnected since the set was read
+                    if room and any(p.is_connected for p in room.players.values()):
+                        continue
+                    await delete_room(room_id, room.players if room else ())
         except Exception as e:
             print(f"Room cleanup error: {e}")
 
@@ -100,28 +101,49 @@ def random_name() -> str:
     return f"{random.choice(names)}_{random.randint(10,99)}"
 
 
-def room_to_broadcast(room: Room) -> dict:
-    """Convert room to a dict suitable for broadcasting to all clients."""
-    data = json.loads(room.model_dump_json())
-    return {"type": "room_state", "room": data}
+def room_to_broadcast(room: Room) -> str:
+    """Encode a room_state message for broadcasting to all clients.
+
+    Reuses the JSON from the preceding save_room when there is one.
+    """
+    return '{"type":"room_state","room":' + room.dump_json() + "}"
+
+
+def room_patch(before: dict, after: dict) -> Optional[str]:
+    """Encode a room_patch message with only the top-level fields and players that changed.
+
+    Removed players are sent as null. Returns None if nothing changed.
+    """
+    changed = {k: v for k, v in after.items() if k != "players" and before.get(k) != v}
+    old_players, new_players = before["players"], after["players"]
+    players = {pid: p for pid, p in new_players.items() if old_players.get(pid) != p}
+    for pid in old_players:
+        if pid not in new_players:
+            players[pid] = None
+    if not changed and not players:
+        return None
+    return encode_message({"type": "room_patch", "room": changed, "players": players})
 
 
 # ─── REST Endpoints ───
 
 async def remove_player_from_all_rooms(player_id: str):
-    """Remove a player from any room they're currently in."""
-    rooms = await list_rooms()
-    for r in rooms:
-        if player_id in r.players:
-            async with get_room_lock(r.id):
-                room = await get_room(r.id)
-                if room and player_id in room.players:
-                    player = room.players[player_id]
-                    if player.seat >= 0:
-                        room.seats[player.seat] = None
-                    del room.players[player_id]
-                    await save_room(room)
-                    await manager.broadcast(room.id, room_to_broadcast(room))
+    """Remove a player from the room they're currently in, if any."""
+    room_id = await get_player_room_id(player_id)
+    if room_id is None:
+        return
+    async with get_room_lock(room_id):
+        room = await get_room(room_id)
+        if room and player_id in room.players:
+            player = room.players[player_id]
+            if player.seat >= 0:
+                room.seats[player.seat] = None
+            del room.players[player_id]
+            room._invalidate_seated()
+            await save_room(room, left=player_id)
+            await manager.broadcast_text(room.id, room_to_broadcast(room))
+        else:
+            await clear_player_room(player_id)
 
 
 @app.post("/api/rooms")
@@ -150,30 +172,13 @@ async def create_room(req: CreateRoomRequest):
         players={player_id: player},
     )
 
-    await save_room(room)
+    await save_room(room, joined=player_id)
     return {"room_id": room_id, "player_id": player_id}
 
 
 @app.get("/api/rooms")
 async def get_rooms():
-    rooms = await list_rooms()
-    result = []
-    for r in rooms:
-        if r.status != RoomStatus.WAITING:
-            continue
-        owner = r.players.get(r.owner_id)
-        online_count = sum(1 for p in r.players.values() if p.is_connected)
-        result.append({
-            "id": r.id,
-            "owner_name": owner.name if owner else "Unknown",
-            "owner_emoji": owner.emoji if owner else "❓",
-            "sb_amount": r.sb_amount,
-            "bb_amount": r.bb_amount,
-            "initial_chips": r.initial_chips,
-            "player_count": online_count,
-            "status": r.status.value,
-        })
-    return result
+    return Response(await lobby_rooms_json(), media_type="application/json")
 
 
 @app.post("/api/rooms/join")
@@ -205,10 +210,10 @@ async def join_room(req: JoinRoomRequest):
             chips=room.initial_chips,
         )
         room.players[player_id] = player
-        await save_room(room)
+        await save_room(room, joined=player_id)
 
     # Broadcast updated room state
-    await manager.broadcast(req.room_id, room_to_broadcast(room))
+    await manager.broadcast_text(req.room_id, room_to_broadcast(room))
 
     return {"room_id": room.id, "player_id": player_id}
 
@@ -216,9 +221,10 @@ async def join_room(req: JoinRoomRequest):
 @app.get("/api/player-room/{player_id}")
 async def get_player_room(player_id: str):
     """Check if a player is currently in an active room."""
-    rooms = await list_rooms()
-    for r in rooms:
-        if player_id in r.players and r.status != RoomStatus.FINISHED:
+    room_id = await get_player_room_id(player_id)
+    if room_id is not None:
+        r = await get_room(room_id)
+        if r and player_id in r.players and r.status != RoomStatus.FINISHED:
             return {"room_id": r.id}
     return {"room_id": None}
 
@@ -237,11 +243,12 @@ async def leave_room_api(room_id: str, player_id: str):
             if player.seat >= 0:
                 room.seats[player.seat] = None
             del room.players[player_id]
+            room._invalidate_seated()
             # Transfer ownership if owner is leaving
             if player_id == room.owner_id and room.players:
                 room.owner_id = next(iter(room.players))
-            await save_room(room)
-            await manager.broadcast(room_id, room_to_broadcast(room))
+            await save_room(room, left=player_id)
+            await manager.broadcast_text(room_id, room_to_broadcast(room))
     return {"ok": True}
 
 
@@ -252,6 +259,10 @@ async def random_profile():
 
 # ─── WebSocket ───
 
+# Heartbeats as the client serializes them: {"type":"ping","timestamp":...}
+_PING_PREFIX = '{"type":"ping"'
+_PONG_PREFIX = '{"type":"pong"'
+
 @app.websocket("/ws/{room_id}/{player_id}")
 async def websocket_endpoint(ws: WebSocket, room_id: str, player_id: str):
     room = await get_room(room_id)
@@ -269,11 +280,25 @@ async def websocket_endpoint(ws: WebSocket, room_id: str, player_id: str):
             room.players[player_id].is_connected = True
             room.last_all_disconnected_at = None
             await save_room(room)
-            await manager.broadcast(room_id, room_to_broadcast(room))
+            await manager.broadcast_text(room_id, room_to_broadcast(room))
 
     try:
         while True:
-            data = await ws.receive_json()
+            raw = await ws.receive_text()
+            if raw.startswith(_PING_PREFIX):
+                # Echo the client's own timestamp back without decoding the frame
+                await manager.send_text_to_player(room_id, player_id, _PONG_PREFIX + raw[len(_PING_PREFIX):])
+                continue
+            try:
+                data = orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                data = None
+            if not isinstance(data, dict):
+                await manager.send_to_player(room_id, player_id, {
+                    "type": "error",
+                    "message": "Invalid message",
+                })
+                continue
             msg_type = data.get("type")
 
             if msg_type == "ping":
@@ -283,43 +308,46 @@ async def websocket_endpoint(ws: WebSocket, room_id: str, player_id: str):
                 })
                 continue
 
+            handler = HANDLERS.get(msg_type)
+            if handler is None:
+                await manager.send_to_player(room_id, player_id, {
+                    "type": "error",
+                    "message": f"Unknown message type: {msg_type}",
+                })
+                continue
+
             # Acquire per-room lock to prevent concurrent state mutations
             async with get_room_lock(room_id):
                 # Reload room state inside lock
                 room = await get_room(room_id)
                 if not room:
-                    await ws.send_json({"type": "error", "message": "Room no longer exists"})
+                    await manager.send_to_player(room_id, player_id, {
+                        "type": "error",
+                        "message": "Room no longer exists",
+                    })
+                    # Let the writer deliver it before the connection is dropped below
+                    await manager.flush(room_id, player_id)
                     break
-
-                if msg_type == "sit":
-                    room, resp = handle_sit(room, player_id, data)
-                elif msg_type == "stand":
-                    room, resp = handle_stand(room, player_id)
-                elif msg_type == "ready":
-                    room, resp = handle_ready(room, player_id)
-                elif msg_type == "action":
-                    room, resp = handle_action(room, player_id, data)
-                elif msg_type == "propose_settle":
-                    room, resp = handle_propose_settle(room, player_id, data)
-                elif msg_type == "confirm_settle":
-                    room, resp = handle_confirm_settle(room, player_id)
-                elif msg_type == "reject_settle":
-                    room, resp = handle_reject_settle(room, player_id)
-                elif msg_type == "rebuy":
-                    room, resp = handle_rebuy(room, player_id)
-                elif msg_type == "cashout":
-                    room, resp = handle_cashout(room, player_id)
-                elif msg_type == "end_game":
-                    room, resp = handle_end_game(room, player_id)
-                else:
-                    resp = {"type": "error", "message": f"Unknown message type: {msg_type}"}
-
-                await save_room(room)
+                before = room.model_dump()
+
+                try:
+                    room, resp = handler(room, player_id, data)
+                except Exception:
+                    # The handler may have half-mutated the cached room without saving it
+                    forget_room(room_id)
+                    raise
+
+                # Rejected messages usually leave the room untouched; skip the write then
+                patch = room_patch(before, room.model_dump())
+                if patch is not None:
+                    await save_room(room)
 
                 if resp.get("type") == "error":
                     await manager.send_to_player(room_id, player_id, resp)
                 else:
-                    await manager.broadcast(room_id, room_to_broadcast(room))
+                    # Clients already hold the full state from connect; send only what changed
+                    if patch is not None:
+                        await manager.broadcast_text(room_id, patch)
                     if resp.get("type") == "event":
                         await manager.broadcast(room_id, resp)
 
@@ -328,7 +356,7 @@ async def websocket_endpoint(ws: WebSocket, room_id: str, player_id: str):
     except Exception as e:
         print(f"WS error: {e}")
     finally:
-        manager.disconnect(room_id, player_id)
+        manager.disconnect(room_id, player_id, ws)
         async with get_room_lock(room_id):
             room = await get_room(room_id)
             if room and player_id in room.players:
@@ -337,7 +365,7 @@ async def websocket_endpoint(ws: WebSocket, room_id: str, player_id: str):
                 if not any(p.is_connected for p in room.players.values()):
                     room.last_all_disconnected_at = time.time()
                 await save_room(room)
-                await manager.broadcast(room_id, room_to_broadcast(room))
+                await manager.broadcast_text(room_id, room_to_broadcast(room))
                 await manager.broadcast(room_id, {
                     "type": "event",
                     "event": "player_disconnected",
@@ -350,10 +378,10 @@ async def websocket_endpoint(ws: WebSocket, room_id: str, player_id: str):
 
 def handle_sit(room: Room, player_id: str, data: dict) -> tuple[Room, dict]:
     seat_index = data.get("seat", -1)
-    if seat_index < 0 or seat_index >= 12:
+    if seat_index < 0 or seat_index >= MAX_SEATS:
         return room, {"type": "error", "message": "Invalid seat"}
 
-    if room.seats.get(seat_index) is not None:
+    if room.seats[seat_index] is not None:
         return room, {"type": "error", "message": "Seat taken"}
 
     if room.status == RoomStatus.PLAYING:
@@ -367,6 +395,7 @@ def handle_sit(room: Room, player_id: str, data: dict) -> tuple[Room, dict]:
 
     player.seat = seat_index
     room.seats[seat_index] = player_id
+    room._invalidate_seated()
     player.status = PlayerStatus.ACTIVE
     player.ready = False
 
@@ -381,6 +410,7 @@ def handle_stand(room: Room, player_id: str) -> tuple[Room, dict]:
     if player.seat >= 0:
         room.seats[player.seat] = None
     player.seat = -1
+    room._invalidate_seated()
     player.status = PlayerStatus.SITTING_OUT
     player.ready = False
 
@@ -420,10 +450,10 @@ def handle_action(room: Room, player_id: str, data: dict) -> tuple[Room, dict]:
 
     room, event = process_action(room, player_id, action, amount)
 
-    if "error" in event:
-        return room, {"type": "error", "message": event["error"]}
+    if event.error is not None:
+        return room, {"type": "error", "message": event.error}
 
-    return room, {"type": "event", "event": "action", **event}
+    return room, {"type": "event", "event": "action", **event.to_dict()}
 
 
 def handle_propose_settle(room: Room, player_id: str, data: dict) -> tuple[Room, dict]:
@@ -497,3 +527,18 @@ def handle_end_game(room: Room, player_id: str) -> tuple[Room, dict]:
 
     room, event = end_game(room)
     return room, {"type": "event", "event": "game_ended", **event}
+
+
+# msg_type -> handler(room, player_id, data)
+HANDLERS: dict[str, Callable[[Room, str, dict], tuple[Room, dict]]] = {
+    "sit": handle_sit,
+    "stand": lambda room, player_id, data: handle_stand(room, player_id),
+    "ready": lambda room, player_id, data: handle_ready(room, player_id),
+    "action": handle_action,
+    "propose_settle": handle_propose_settle,
+    "confirm_settle": lambda room, player_id, data: handle_confirm_settle(room, player_id),
+    "reject_settle": lambda room, player_id, data: handle_reject_settle(room, player_id),
+    "rebuy": lambda room, player_id, data: handle_rebuy(room, player_id),
+    "cashout": lambda room, player_id, data: handle_cashout(room, player_id),
+    "end_game": lambda room, player_id, data: handle_end_game(room, player_id),
+}
@@ -1,16 +1,18 @@
 from __future__ import annotations
-from enum import Enum
+from enum import StrEnum
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
+MAX_SEATS = 12
 
-class RoomStatus(str, Enum):
+
+class RoomStatus(StrEnum):
     WAITING = "waiting"
     PLAYING = "playing"
     FINISHED = "finished"
 
 
-class HandPhase(str, Enum):
+class HandPhase(StrEnum):
     HAND_START = "hand_start"
     PREFLOP = "preflop"
     FLOP = "flop"
@@ -20,7 +22,7 @@ class HandPhase(str, Enum):
     HAND_END = "hand_end"
 
 
-class PlayerAction(str, Enum):
+class PlayerAction(StrEnum):
     FOLD = "fold"
     CHECK = "check"
     CALL = "call"
@@ -28,7 +30,7 @@ class PlayerAction(str, Enum):
     ALL_IN = "all_in"
 
 
-class PlayerStatus(str, Enum):
+class PlayerStatus(StrEnum):
     ACTIVE = "active"
     FOLDED = "folded"
     ALL_IN = "all_in"
@@ -88,6 +90,10 @@ class PotInfo(BaseModel):
     amount: int
     eligible_players: list[str]  # player_ids
 
+    def to_dict(self) -> dict:
+        """Plain-dict form for event payloads, without pydantic's model_dump machinery."""
+        return {"id": self.id, "amount": self.amount, "eligible_players": list(self.eligible_players)}
+
 
 class SettlementProposal(BaseModel):
     proposer_id: str
@@ -104,7 +110,7 @@ class HandState(BaseModel):
     pot: int = 0
     pots: list[PotInfo] = []
     current_player_id: Optional[str] = None
-    action_order: list[str] = []
+    action_order: list[int] = []  # seat indices
     action_index: int = 0
     last_raiser_id: Optional[str] = None
     settlement_proposal: Optional[SettlementProposal] = None
@@ -121,13 +127,34 @@ class Room(BaseModel):
     hand_interval: int = 5  # seconds between hands
     max_chips: int = 0  # 0 = no cap
     players: dict[str, Player] = {}
-    seats: dict[int, Optional[str]] = {}  # seat_index -> player_id
+    seats: list[Optional[str]] = []  # seat_index -> player_id, MAX_SEATS long
     hand: Optional[HandState] = None
     hand_number: int = 0
     last_all_disconnected_at: Optional[float] = None
 
+    # Seating caches, rebuilt lazily by game_engine.get_seated_players
+    _sorted_seat_indices: Optional[tuple[int, ...]] = PrivateAttr(default=None)
+    _seated_player_cache: Optional[tuple[Player, ...]] = PrivateAttr(default=None)
+    _seat_to_player: Optional[list[Optional[Player]]] = PrivateAttr(default=None)
+    _next_seat: Optional[list[int]] = PrivateAttr(default=None)
+    # JSON written by the last save_room, reused by the room_state broadcast that follows it
+    _json_cache: Optional[str] = PrivateAttr(default=None)
+
     def model_post_init(self, __context) -> None:
         if self.bb_amount == 0:
             self.bb_amount = self.sb_amount * 2
         if not self.seats:
-            self.seats = {i: None for i in range(12)}
+            self.seats = [None] * MAX_SEATS
+
+    def _invalidate_seated(self) -> None:
+        """Drop seating caches. Call after changing seats, player.seat or players."""
+        self._sorted_seat_indices = None
+        self._seated_player_cache = None
+        self._seat_to_player = None
+        self._next_seat = None
+
+    def dump_json(self, refresh: bool = False) -> str:
+        """model_dump_json(), memoized. Pass refresh=True after mutating the room."""
+        if refresh or self._json_cache is None:
+            self._json_cache = self.model_dump_json()
+        return self._json_cache
@@ -1,25 +1,44 @@
 import os
-import json
+import time
+from collections import OrderedDict
+import orjson
 import redis.asyncio as redis
-from typing import Optional
-from .models import Room
+from typing import Iterable, Optional
+from .models import Room, RoomStatus
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Upper bound on open Redis connections; callers wait for a free one beyond that
+REDIS_POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", "32"))
 
 _pool: Optional[redis.Redis] = None
 
+# Parsed rooms by id, so a message doesn't pay for a GET + validate of the room it
+# just saved. The server runs as a single process, so every write goes through
+# save_room/delete_room here and the cache can't go stale behind our back.
+ROOM_CACHE_SIZE = 1024
+_room_cache: OrderedDict[str, Room] = OrderedDict()
+
 
 async def get_redis() -> redis.Redis:
     global _pool
     if _pool is None:
-        _pool = redis.from_url(REDIS_URL, decode_responses=True)
+        pool = redis.BlockingConnectionPool.from_url(
+            REDIS_URL,
+            max_connections=REDIS_POOL_SIZE,
+            timeout=5,
+            socket_keepalive=True,
+            health_check_interval=30,
+            decode_responses=True,
+        )
+        _pool = redis.Redis(connection_pool=pool)
     return _pool
 
 
 async def close_redis():
     global _pool
     if _pool:
-        await _pool.close()
+        await _pool.aclose()
+        await _pool.connection_pool.disconnect()
         _pool = None
 
 
@@ -31,53 +50,143 @@ def _rooms_list_key() -> str:
     return "rooms:list"
 
 
-async def save_room(room: Room):
-    r = await get_redis()
-    data = room.model_dump_json()
-    pipe = r.pipeline()
-    pipe.set(_room_key(room.id), data)
-    pipe.sadd(_rooms_list_key(), room.id)
-    await pipe.execute()
+def _player_room_key() -> str:
+    return "player_to_room"
+
+
+def _idle_rooms_key() -> str:
+    return "rooms:idle"
+
+
+def _lobby_key() -> str:
+    return "lobby:summary"
+
+
+def _lobby_entry(room: Room) -> bytes:
+    """Summary shown in the lobby's room list."""
+    owner = room.players.get(room.owner_id)
+    return orjson.dumps({
+        "id": room.id,
+        "owner_name": owner.name if owner else "Unknown",
+        "owner_emoji": owner.emoji if owner else "❓",
+        "sb_amount": room.sb_amount,
+        "bb_amount": room.bb_amount,
+        "initial_chips": room.initial_chips,
+        "player_count": sum(1 for p in room.players.values() if p.is_connected),
+        "status": room.status.value,
+    })
+
+
+def _cache_room(room: Room):
+    _room_cache[room.id] = room
+    _room_cache.move_to_end(room.id)
+    if len(_room_cache) > ROOM_CACHE_SIZE:
+        _room_cache.popitem(last=False)
+
+
+def forget_room(room_id: str):
+    """Drop a room from the in-process cache, e.g. after a failed mutation that was never saved."""
+    _room_cache.pop(room_id, None)
+
+
+async def save_room(room: Room, joined: Optional[str] = None, left: Optional[str] = None):
+    """Write a room with its lobby entry and idle marker in one transaction.
+
+    `joined`/`left` is a player id to add to or drop from the player -> room index.
+    """
+    # Callers mutate the cached room in place; if the write doesn't land,
+    # drop it so the next get_room reloads what Redis actually holds
+    try:
+        r = await get_redis()
+        data = room.dump_json(refresh=True)
+        pipe = r.pipeline(transaction=True)
+        pipe.set(_room_key(room.id), data)
+        pipe.sadd(_rooms_list_key(), room.id)
+        # Only waiting rooms are listed in the lobby
+        if room.status == RoomStatus.WAITING:
+            pipe.hset(_lobby_key(), room.id, _lobby_entry(room))
+        else:
+            pipe.hdel(_lobby_key(), room.id)
+        # Idle rooms are scored by when they went idle, for room_cleanup_task
+        if any(p.is_connected for p in room.players.values()):
+            pipe.zrem(_idle_rooms_key(), room.id)
+        else:
+            since = room.last_all_disconnected_at or time.time()
+            pipe.zadd(_idle_rooms_key(), {room.id: since}, nx=True)
+        if joined is not None:
+            pipe.hset(_player_room_key(), joined, room.id)
+        if left is not None:
+            pipe.hdel(_player_room_key(), left)
+        await pipe.execute()
+    except BaseException:
+        forget_room(room.id)
+        raise
+    _cache_room(room)
 
 
 async def get_room(room_id: str) -> Optional[Room]:
+    room = _room_cache.get(room_id)
+    if room is not None:
+        _room_cache.move_to_end(room_id)
+        return room
     r = await get_redis()
     data = await r.get(_room_key(room_id))
     if data is None:
         return None
-    return Room.model_validate_json(data)
+    # orjson + dict validation is ~40% faster than pydantic's own JSON parsing here
+    room = Room.model_validate(orjson.loads(data))
+    _cache_room(room)
+    return room
 
 
-async def delete_room(room_id: str):
+async def delete_room(room_id: str, player_ids: Iterable[str] = ()):
+    """Delete a room. Pass its player ids to drop them from the player -> room index too."""
+    forget_room(room_id)
     r = await get_redis()
     pipe = r.pipeline()
     pipe.delete(_room_key(room_id))
     pipe.srem(_rooms_list_key(), room_id)
+    pipe.zrem(_idle_rooms_key(), room_id)
+    pipe.hdel(_lobby_key(), room_id)
+    player_ids = list(player_ids)
+    if player_ids:
+        pipe.hdel(_player_room_key(), *player_ids)
     await pipe.execute()
 
 
-async def list_room_ids() -> list[str]:
+async def idle_room_ids(before: float) -> list[str]:
+    """Ids of rooms that have been idle since before the given timestamp."""
     r = await get_redis()
-    return list(await r.smembers(_rooms_list_key()))
+    return await r.zrangebyscore(_idle_rooms_key(), "-inf", before)
 
 
-async def list_rooms() -> list[Room]:
-    ids = await list_room_ids()
-    rooms = []
-    for rid in ids:
-        room = await get_room(rid)
-        if room:
-            rooms.append(room)
-    return rooms
+async def clear_player_room(player_id: str):
+    r = await get_redis()
+    await r.hdel(_player_room_key(), player_id)
+
+
+async def get_player_room_id(player_id: str) -> Optional[str]:
+    r = await get_redis()
+    return await r.hget(_player_room_key(), player_id)
+
+
+async def lobby_rooms_json() -> str:
+    """JSON array of the lobby summaries of all waiting rooms."""
+    r = await get_redis()
+    return "[" + ",".join(await r.hvals(_lobby_key())) + "]"
+
+
+async def list_room_ids() -> set[str]:
+    r = await get_redis()
+    return await r.smembers(_rooms_list_key())
 
 
 async def flush_all_rooms():
     """Delete all rooms from Redis."""
+    _room_cache.clear()
     r = await get_redis()
-    ids = list(await r.smembers(_rooms_list_key()))
-    if ids:
-        pipe = r.pipeline()
-        for rid in ids:
-            pipe.delete(_room_key(rid))
-        pipe.delete(_rooms_list_key())
-        await pipe.execute()
+    ids = await list_room_ids()
+    await r.delete(
+        *map(_room_key, ids),
+        _rooms_list_key(), _player_room_key(), _idle_rooms_key(), _lobby_key(),
+    )
@@ -1,48 +1,143 @@
 from __future__ import annotations
-import json
+import asyncio
 from typing import Optional
+import orjson
 from fastapi import WebSocket
 
+# Seconds a single send may take before the client is treated as dead
+SEND_TIMEOUT = 5.0
+# Messages a connection may have queued before it is treated as too slow
+SEND_QUEUE_SIZE = 64
+
+
+def encode_message(data: dict) -> str:
+    """Encode a message as compact JSON text."""
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+class Connection:
+    """A client socket with its outgoing queue and the task that drains it."""
+
+    __slots__ = ("ws", "queue", "writer")
+
+    def __init__(self, ws: WebSocket):
+        self.ws = ws
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.writer: Optional[asyncio.Task] = None
+
 
 class ConnectionManager:
-    """Manage WebSocket connections per room."""
+    """Manage WebSocket connections per room.
+
+    Sends never block the caller: each connection has a bounded queue drained by
+    its own writer task, so a slow client can't stall the room's handlers.
+    Nothing below awaits while changing `rooms`, so no locking is needed.
+    """
 
     def __init__(self):
-        # room_id -> {player_id -> WebSocket}
-        self.rooms: dict[str, dict[str, WebSocket]] = {}
+        # room_id -> {player_id -> Connection}
+        self.rooms: dict[str, dict[str, Connection]] = {}
+        # Close tasks for dropped sockets, kept so they aren't garbage collected
+        self._closing: set[asyncio.Task] = set()
 
     async def connect(self, room_id: str, player_id: str, ws: WebSocket):
         await ws.accept()
-        if room_id not in self.rooms:
-            self.rooms[room_id] = {}
-        self.rooms[room_id][player_id] = ws
+        conns = self.rooms.setdefault(room_id, {})
+        old = conns.get(player_id)
+        if old is not None and old.writer is not None:
+            old.writer.cancel()
+        conn = Connection(ws)
+        conn.writer = asyncio.create_task(self._writer(room_id, player_id, conn))
+        conns[player_id] = conn
+
+    def disconnect(self, room_id: str, player_id: str, ws: Optional[WebSocket] = None):
+        """Drop a player's connection. If `ws` is given, only drop it if it is still the current one."""
+        conns = self.rooms.get(room_id)
+        if conns is None:
+            return
+        conn = conns.get(player_id)
+        if conn is None or (ws is not None and conn.ws is not ws):
+            return
+        del conns[player_id]
+        if conn.writer is not None and conn.writer is not asyncio.current_task():
+            conn.writer.cancel()
+        if not conns:
+            del self.rooms[room_id]
 
-    def disconnect(self, room_id: str, player_id: str):
-        if room_id in self.rooms:
-            self.rooms[room_id].pop(player_id, None)
-            if not self.rooms[room_id]:
-                del self.rooms[room_id]
+    async def _writer(self, room_id: str, player_id: str, conn: Connection):
+        queue = conn.queue
+        try:
+            while True:
+                text = await queue.get()
+                count = 1
+                if not queue.empty():
+                    # Everything queued meanwhile (e.g. a room_patch and its event)
+                    # goes out as one frame
+                    texts = [text]
+                    while not queue.empty():
+                        texts.append(queue.get_nowait())
+                    count = len(texts)
+                    text = '{"type":"batch","messages":[' + ",".join(texts) + "]}"
+                try:
+                    await asyncio.wait_for(conn.ws.send_text(text), SEND_TIMEOUT)
+                finally:
+                    for _ in range(count):
+                        queue.task_done()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._drop(room_id, player_id, conn)
+
+    def _drop(self, room_id: str, player_id: str, conn: Connection):
+        """Drop a connection that failed or fell behind.
+
+        The client has missed an update, so it is closed and must reconnect to
+        get the full state again.
+        """
+        self.disconnect(room_id, player_id, conn.ws)
+        task = asyncio.create_task(self._safe_close(conn.ws))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    async def _safe_close(ws: WebSocket):
+        try:
+            await asyncio.wait_for(ws.close(code=1011), SEND_TIMEOUT)
+        except Exception:
+            pass
+
+    def _enqueue(self, room_id: str, player_id: str, conn: Connection, text: str):
+        try:
+            conn.queue.put_nowait(text)
+        except asyncio.QueueFull:
+            self._drop(room_id, player_id, conn)
 
     async def send_to_player(self, room_id: str, player_id: str, data: dict):
-        ws = self.rooms.get(room_id, {}).get(player_id)
-        if ws:
+        await self.send_text_to_player(room_id, player_id, encode_message(data))
+
+    async def send_text_to_player(self, room_id: str, player_id: str, text: str):
+        conn = self.rooms.get(room_id, {}).get(player_id)
+        if conn:
+            self._enqueue(room_id, player_id, conn, text)
+
+    async def flush(self, room_id: str, player_id: str):
+        """Wait until everything queued for a player has been sent, at most SEND_TIMEOUT."""
+        conn = self.rooms.get(room_id, {}).get(player_id)
+        if conn:
             try:
-                await ws.send_json(data)
-            except Exception:
-                self.disconnect(room_id, player_id)
+                await asyncio.wait_for(conn.queue.join(), SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
 
     async def broadcast(self, room_id: str, data: dict, exclude: Optional[str] = None):
-        connections = self.rooms.get(room_id, {})
-        dead = []
-        for pid, ws in connections.items():
-            if pid == exclude:
-                continue
-            try:
-                await ws.send_json(data)
-            except Exception:
-                dead.append(pid)
-        for pid in dead:
-            self.disconnect(room_id, pid)
+        """Encode once and send the same payload to every connection in the room."""
+        await self.broadcast_text(room_id, encode_message(data), exclude)
+
+    async def broadcast_text(self, room_id: str, text: str, exclude: Optional[str] = None):
+        """Queue a pre-encoded JSON message on every connection in the room."""
+        for pid, conn in list(self.rooms.get(room_id, {}).items()):
+            if pid != exclude:
+                self._enqueue(room_id, pid, conn, text)
 
 
 manager = ConnectionManager()
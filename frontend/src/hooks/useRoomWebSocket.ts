@@ -2,7 +2,7 @@ import { useEffect, useCallback, useRef, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useStore } from '../store';
 import { connectWs } from '../api';
-import { Standing } from '../types';
+import { Player, Standing } from '../types';
 import { WinInfo } from '../components/WinChipsAnimation';
 
 export function useRoomWebSocket(roomId: string | null) {
@@ -42,56 +42,73 @@ export function useRoomWebSocket(roomId: string | null) {
       }, 3000);
     };
 
-    socket.onmessage = (e) => {
-      try {
-        const data = JSON.parse(e.data);
-        if (data.type === 'pong') {
-          setLatency(Date.now() - data.timestamp);
-        } else if (data.type === 'room_state') {
-          setRoom(data.room);
-        } else if (data.type === 'event') {
-          if (data.event === 'game_ended' && data.standings) {
-            setStandings(data.standings as Standing[]);
-          }
-          if (data.event === 'action' && data.action === 'all_in') {
-            // Trigger speech synthesis for all-in
-            if ('speechSynthesis' in window) {
-              const text = `${data.player_name} All in`;
-              const utterance = new SpeechSynthesisUtterance(text);
-              utterance.lang = 'zh-CN';
-              utterance.rate = 1.1; 
-              utterance.pitch = 1.1;
-              window.speechSynthesis.speak(utterance);
-              // iOS Safari 修复：在 WebSocket 的异步回调中触发语音极易被挂起，
-              // 必须在 speak() 之后显式调用 resume()。另外千万不能用 cancel()，它会导致 iOS 的语音队列永久卡死。
-              window.speechSynthesis.resume();
-            }
+    const handleMessage = (data: any) => {
+      if (data.type === 'pong') {
+        setLatency(Date.now() - data.timestamp);
+      } else if (data.type === 'room_state') {
+        setRoom(data.room);
+      } else if (data.type === 'room_patch') {
+        // Only changed top-level fields and players are sent; removed players are null
+        const current = useStore.getState().room;
+        if (current) {
+          const players = { ...current.players };
+          for (const [pid, p] of Object.entries(data.players as Record<string, Player | null>)) {
+            if (p === null) delete players[pid];
+            else players[pid] = p;
           }
-          // Capture single-winner (fold victory) events for win animation
-          const winEvent = data.single_winner ? data : data.phase_change?.single_winner ? data.phase_change : null;
-          if (winEvent && winEvent.single_winner && winEvent.winner && winEvent.pot) {
-            pendingSingleWinRef.current = { winner: winEvent.winner, winner_name: winEvent.winner_name, pot: winEvent.pot };
-            setTimeout(() => {
-              const ev = pendingSingleWinRef.current;
-              if (!ev) return;
-              pendingSingleWinRef.current = null;
-              const currentRoom = useStore.getState().room;
-              const p = currentRoom?.players[ev.winner];
-              if (p && ev.pot > 0 && !winAnimPlayingRef.current) {
-                winAnimPlayingRef.current = true;
-                setWinAnimPlaying(true);
-                const savedPos = potPositionRef.current || { x: window.innerWidth / 2, y: window.innerHeight / 3, width: window.innerWidth * 0.8 };
-                setWinAnimPotPos(savedPos);
-                const winInfos: WinInfo[] = [{ playerId: ev.winner, playerEmoji: p.emoji, playerName: ev.winner_name || p.name, amount: ev.pot }];
-                setTimeout(() => setWinAnimationData(winInfos), 100);
-              }
-            }, 50);
+          setRoom({ ...current, ...data.room, players });
+        }
+      } else if (data.type === 'event') {
+        if (data.event === 'game_ended' && data.standings) {
+          setStandings(data.standings as Standing[]);
+        }
+        if (data.event === 'action' && data.action === 'all_in') {
+          // Trigger speech synthesis for all-in
+          if ('speechSynthesis' in window) {
+            const text = `${data.player_name} All in`;
+            const utterance = new SpeechSynthesisUtterance(text);
+            utterance.lang = 'zh-CN';
+            utterance.rate = 1.1; 
+            utterance.pitch = 1.1;
+            window.speechSynthesis.speak(utterance);
+            // iOS Safari 修复：在 WebSocket 的异步回调中触发语音极易被挂起，
+            // 必须在 speak() 之后显式调用 resume()。另外千万不能用 cancel()，它会导致 iOS 的语音队列永久卡死。
+            window.speechSynthesis.resume();
           }
-          addEvent(data.event + (data.detail ? `: ${data.detail}` : ''));
-        } else if (data.type === 'error') {
-          setError(data.message);
-          setTimeout(() => setError(null), 3000);
         }
+        // Capture single-winner (fold victory) events for win animation
+        const winEvent = data.single_winner ? data : data.phase_change?.single_winner ? data.phase_change : null;
+        if (winEvent && winEvent.single_winner && winEvent.winner && winEvent.pot) {
+          pendingSingleWinRef.current = { winner: winEvent.winner, winner_name: winEvent.winner_name, pot: winEvent.pot };
+          setTimeout(() => {
+            const ev = pendingSingleWinRef.current;
+            if (!ev) return;
+            pendingSingleWinRef.current = null;
+            const currentRoom = useStore.getState().room;
+            const p = currentRoom?.players[ev.winner];
+            if (p && ev.pot > 0 && !winAnimPlayingRef.current) {
+              winAnimPlayingRef.current = true;
+              setWinAnimPlaying(true);
+              const savedPos = potPositionRef.current || { x: window.innerWidth / 2, y: window.innerHeight / 3, width: window.innerWidth * 0.8 };
+              setWinAnimPotPos(savedPos);
+              const winInfos: WinInfo[] = [{ playerId: ev.winner, playerEmoji: p.emoji, playerName: ev.winner_name || p.name, amount: ev.pot }];
+              setTimeout(() => setWinAnimationData(winInfos), 100);
+            }
+          }, 50);
+        }
+        addEvent(data.event + (data.detail ? `: ${data.detail}` : ''));
+      } else if (data.type === 'error') {
+        setError(data.message);
+        setTimeout(() => setError(null), 3000);
+      }
+    };
+
+    socket.onmessage = (e) => {
+      try {
+        const data = JSON.parse(e.data);
+        // Messages queued back-to-back on the server arrive as one batch frame
+        if (data.type === 'batch') data.messages.forEach(handleMessage);
+        else handleMessage(data);
       } catch { }
     };
 
@@ -36,7 +36,7 @@ export interface HandState {
   pot: number;
   pots: PotInfo[];
   current_player_id: string | null;
-  action_order: string[];
+  action_order: number[];
   action_index: number;
   last_raiser_id: string | null;
   settlement_proposal: SettlementProposal | null;
@@ -53,7 +53,7 @@ export interface Room {
   hand_interval: number;
   max_chips: number;
   players: Record<string, Player>;
-  seats: Record<number, string | null>;
+  seats: (string | null)[];
   hand: HandState | null;
   hand_number: number;
 }